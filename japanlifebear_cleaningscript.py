@@ -1,7 +1,17 @@
+import numpy as np
 import pandas as pd
+from pandas.util import hash_pandas_object
 import re
 import logging
 import os
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+
+try:
+    import pyarrow  # noqa: F401  (optional: enables Arrow-backed string columns)
+    string_dtype = 'string[pyarrow]'
+except ImportError:
+    string_dtype = str
 
 # Logging configuration
 logging.basicConfig(
@@ -22,135 +32,180 @@ rename_mapping = {
 # Adjust chunk_size to process four chunks
 chunk_size = 900000  
 columns_to_clean = ['login_id', 'mail_address']
-pattern = r'[^\w\s@.\-]'
-
-# Function to validate email
-def is_valid_email(email):
-    """Validates the format of a mail address."""
-    pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
-    return bool(re.match(pattern, email))
-
-# Function to check for missing critical columns
-def is_valid_row(row):
-    """Validates a row to ensure no critical columns are missing."""
-    if pd.isna(row['login_id']) or pd.isna(row['mail_address']):
-        return False  # Consider it garbage if login_id or mail_address is missing
-    return True
-
-# Function to check if birthday is a valid date
-def is_valid_birthday(birthday):
-    """Check if the birthday is a valid date."""
-    try:
-        pd.to_datetime(birthday, errors='raise')  # Try to convert to datetime
-        return True
-    except Exception:
-        return False
-
-# Function to handle errors during data processing
-def safe_process(func, *args, **kwargs):
-    """Wraps a function in a try-except block for error handling."""
+
+# A row is a duplicate when its (login_id, mail_address) pair occurs more than once anywhere in the file
+key_columns = ['login_id', 'mail_address']
+
+# Number of chunks cleaned in parallel. Each in-flight chunk is held by the parent until its
+# result arrives, pickled into a worker, and pickled back as a processed frame, so peak memory
+# grows by roughly three chunks' worth per extra chunk in flight. Raise only if RAM allows.
+max_chunks_in_flight = 2
+
+# Worker processes (Windows' ProcessPoolExecutor rejects more than 61). With a single worker,
+# chunks are processed inline instead, since a one-process pool only adds pickling overhead.
+max_workers = max(1, min(max_chunks_in_flight, os.cpu_count() or 1, 61))
+
+# Read identifier-like columns as strings so numeric-looking values are not parsed as floats
+string_columns = ['login_id', 'mail_address', 'password', 'salt']
+read_dtypes = {col: string_dtype for col in string_columns}
+read_dtypes.update({src: string_dtype for src, dst in rename_mapping.items() if dst in string_columns})
+
+# Low-cardinality columns are read as categoricals to shrink per-chunk memory
+category_columns = ['gender']
+read_dtypes.update({col: 'category' for col in category_columns})
+
+# Precompiled regular expressions, reused for every row and chunk. Arrow's regex engine (RE2)
+# treats \w as ASCII-only: str.replace falls back to Python re for compiled patterns, but
+# str.match does not, so the email check casts to object first (see process_chunk).
+pattern = re.compile(r'[^\w\s@.\-]')
+_EMAIL_RE = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w+$')
+
+# Function to hash the duplicate key of each row
+def hash_keys(chunk):
+    """Returns one 64-bit hash per row of the cleaned (login_id, mail_address) key."""
+    return hash_pandas_object(chunk[key_columns], index=False).to_numpy()
+
+# Function to find the keys that occur more than once in the whole file
+def find_duplicate_keys(file_path):
+    """First pass over the key columns only; returns the sorted hashes of keys seen more than once."""
+    key_hashes = []
+    for chunk in pd.read_csv(file_path, chunksize=chunk_size, delimiter=';', dtype=read_dtypes,
+                             usecols=lambda col: rename_mapping.get(col, col) in key_columns):
+        # Rename and clean the key columns exactly as process_chunk does, so the hashes match
+        chunk = chunk.rename(columns=rename_mapping)
+        for col in key_columns:
+            if col not in chunk.columns:
+                chunk[col] = pd.NA
+        for col in columns_to_clean:
+            chunk[col] = chunk[col].str.replace(pattern, '', regex=True)
+        key_hashes.append(hash_keys(chunk))
+
+    unique_hashes, counts = np.unique(np.concatenate(key_hashes or [np.empty(0, dtype=np.uint64)]),
+                                      return_counts=True)
+    return unique_hashes[counts > 1]
+
+# Function to clean and validate a single chunk (runs in a worker process)
+def process_chunk(chunk, i):
+    """Cleans one chunk and adds its validation flags; returns the chunk and its duplicate-key hashes."""
+    logging.info("Processing chunk %d", i + 1)
+
+    # Print the column names for debugging
+    print(f"Columns in chunk {i+1}: {chunk.columns.tolist()}")
+
+    # Rename columns
+    chunk.rename(columns=rename_mapping, inplace=True)
+
+    # Ensure expected columns are present
+    for col in expected_columns:
+        if col not in chunk.columns:
+            chunk[col] = pd.NA  # or a default value
+
+    # Reorder columns (reindex returns a new frame, so later in-place edits don't hit a slice)
+    chunk = chunk.reindex(columns=expected_columns)
+
+    # Remove empty lines
+    chunk.dropna(how='all', inplace=True)
+
+    # Remove unauthorized characters from specified columns (missing values pass through untouched)
+    for col in columns_to_clean:
+        chunk[col] = chunk[col].str.replace(pattern, '', regex=True)
+
+    # Standardize data types (keep the raw birthdays to tell missing from unparseable).
+    # format='mixed' parses each value on its own, so one chunk may mix date formats.
+    raw_birthday = chunk['birthday_on']
+    chunk['birthday_on'] = pd.to_datetime(raw_birthday, errors='coerce', format='mixed')
+
+    # Modify 'created_at' to remove the time part
+    chunk['created_at'] = pd.to_datetime(chunk['created_at'], errors='coerce', format='mixed').dt.date
+
+    # Initialize garbage validation for multiple criteria
+    # Vectorized email check; astype(object) keeps the match on Python re, since Arrow-backed
+    # strings would run the pattern on RE2, where \w is ASCII-only and rejects Japanese addresses
+    chunk['Email_Valid'] = chunk['mail_address'].astype(object).str.match(_EMAIL_RE, na=False)
+    chunk['Row_Valid'] = chunk[['login_id', 'mail_address']].notna().all(axis=1)  # Ensure no critical columns are missing
+    chunk['Birthday_Valid'] = chunk['birthday_on'].notna() | raw_birthday.isna()  # Check valid birthday
+
+    # Hash the duplicate key; save_chunk checks it against the keys repeated anywhere in the file
+    key_hashes = hash_keys(chunk)
+
+    return chunk, key_hashes
+
+# Executor used when there is only one worker: runs each chunk immediately in this process
+class InlineExecutor(Executor):
+    """Runs submitted calls synchronously and returns already-completed futures."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+# Function to split a processed chunk into clean and garbage rows and append them to the final datasets
+def save_chunk(i, future, duplicate_keys, clean_fh, garbage_fh):
+    """Writes one processed chunk to the final datasets."""
     try:
-        return func(*args, **kwargs)
+        chunk, key_hashes = future.result()
+
+        # Every copy of a key that occurs more than once in the file is a duplicate (keep=False),
+        # so the result does not depend on where the chunk boundaries fall
+        chunk['Duplicate'] = np.isin(key_hashes, duplicate_keys)
+
+        # Combine all validation criteria (valid email, valid row, valid birthday, and not a duplicate)
+        valid_rows = np.logical_and.reduce([
+            chunk['Email_Valid'].to_numpy(dtype=bool),
+            chunk['Row_Valid'].to_numpy(dtype=bool),
+            chunk['Birthday_Valid'].to_numpy(dtype=bool),
+            ~chunk['Duplicate'].to_numpy(dtype=bool),
+        ])
+        valid_chunk = chunk.loc[valid_rows, expected_columns]  # Select rows and drop the flag columns in one step
+        garbage_chunk = chunk[~valid_rows]  # Rows that failed any validation check
+
+        # Log how many rows are garbage
+        logging.info("Chunk %d has %d garbage rows (including duplicates).", i + 1, len(garbage_chunk))
+
+        # Append to the final datasets, writing the header only once per file
+        valid_chunk.to_csv(clean_fh, header=clean_fh.tell() == 0, index=False)
+        garbage_chunk.to_csv(garbage_fh, header=garbage_fh.tell() == 0, index=False)
+        logging.info("Appended chunk %d to the final cleaned and garbage datasets", i + 1)
+
     except Exception as e:
-        logging.error(f"Error occurred: {e}")
-        return pd.NA
+        logging.error("Error processing chunk %d: %s", i + 1, e)
 
 def process_data(file_path, clean_file_prefix, garbage_file_prefix):
     """Processes the dataset in chunks and handles cleaning, validation, and error logging."""
-    logging.info(f"Starting data processing for {file_path} with chunk size {chunk_size}")
+    logging.info("Starting data processing for %s with chunk size %d", file_path, chunk_size)
     
     if not os.path.exists(file_path):
-        logging.error(f"File not found: {file_path}")
+        logging.error("File not found: %s", file_path)
         raise FileNotFoundError(f"File not found: {file_path}")
     
-    # Lists to store cleaned and garbage chunks for final merging
-    all_cleaned_chunks = []
-    all_garbage_chunks = []
-    
-    for i, chunk in enumerate(pd.read_csv(file_path, chunksize=chunk_size, delimiter=';')):
-        logging.info(f"Processing chunk {i+1}")
-        
-        try:
-            # Make a copy to avoid the "Setting on a copy of a slice" warning
-            chunk = chunk.copy()
-
-            # Print the column names for debugging
-            print(f"Columns in chunk {i+1}: {chunk.columns.tolist()}")
-
-            # Rename columns
-            chunk.rename(columns=rename_mapping, inplace=True)
-
-            # Ensure expected columns are present
-            for col in expected_columns:
-                if col not in chunk.columns:
-                    chunk[col] = pd.NA  # or a default value
-            
-            # Reorder columns
-            chunk = chunk[expected_columns]
-            
-            # Remove empty lines
-            chunk.dropna(how='all', inplace=True)
-            
-            # Remove unauthorized characters from specified columns
-            for col in columns_to_clean:
-                chunk[col] = safe_process(lambda: chunk[col].astype(str).str.replace(pattern, '', regex=True))
-            
-            # Standardize data types
-            chunk['birthday_on'] = pd.to_datetime(chunk['birthday_on'], errors='coerce')
-            
-            # Modify 'created_at' to remove the time part
-            chunk['created_at'] = pd.to_datetime(chunk['created_at'], errors='coerce').dt.date
-
-            # Initialize garbage validation for multiple criteria
-            chunk['Email_Valid'] = chunk['mail_address'].apply(is_valid_email)
-            chunk['Row_Valid'] = chunk.apply(is_valid_row, axis=1)  # Ensure no critical columns are missing
-            chunk['Birthday_Valid'] = chunk['birthday_on'].apply(is_valid_birthday)  # Check valid birthday
-            
-            # Identify duplicate rows based on 'login_id' and 'mail_address'
-            chunk['Duplicate'] = chunk.duplicated(subset=['login_id', 'mail_address'], keep=False)
-            
-            # Combine all validation criteria (valid email, valid row, valid birthday, and not a duplicate)
-            valid_rows = (chunk['Email_Valid'] & chunk['Row_Valid'] & chunk['Birthday_Valid'] & ~chunk['Duplicate'])
-            valid_chunk = chunk[valid_rows].drop(columns=['Email_Valid', 'Row_Valid', 'Birthday_Valid', 'Duplicate'])
-            garbage_chunk = chunk[~valid_rows]  # Rows that failed any validation check
-            
-            # Log how many rows are garbage
-            logging.info(f"Chunk {i+1} has {len(garbage_chunk)} garbage rows (including duplicates).")
-            
-            # Save valid chunk
-            valid_chunk_file = f"{clean_file_prefix}_chunk_{i+1}.csv"
-            valid_chunk.to_csv(valid_chunk_file, index=False)
-            logging.info(f"Saved cleaned data chunk {i+1} to {valid_chunk_file}")
-            
-            # Save garbage chunk (if any)
-            if not garbage_chunk.empty:
-                garbage_chunk_file = f"{garbage_file_prefix}_chunk_{i+1}.csv"
-                garbage_chunk.to_csv(garbage_chunk_file, index=False)
-                logging.info(f"Saved garbage data chunk {i+1} to {garbage_chunk_file}")
-            else:
-                logging.info(f"No garbage data in chunk {i+1}.")
-            
-            # Collect chunks for final concatenation
-            all_cleaned_chunks.append(valid_chunk)
-            all_garbage_chunks.append(garbage_chunk)
-        
-        except Exception as e:
-            logging.error(f"Error processing chunk {i+1}: {e}")
-    
-    logging.info("Data processing complete.")
+    final_cleaned_file = f"{clean_file_prefix}_final.csv"
+    final_garbage_file = f"{garbage_file_prefix}_final.csv"
+
+    # 64-bit hashes of the (login_id, mail_address) keys that occur more than once in the file
+    duplicate_keys = find_duplicate_keys(file_path)
+    logging.info("Found %d repeated login_id/mail_address keys", len(duplicate_keys))
+
+    # Chunks are cleaned in parallel but saved in file order, with at most max_workers pending
+    pending = deque()
 
-    # After processing all chunks, concatenate and save final datasets
-    if all_cleaned_chunks:
-        final_cleaned_data = pd.concat(all_cleaned_chunks, ignore_index=True)
-        final_cleaned_file = f"{clean_file_prefix}_final.csv"
-        final_cleaned_data.to_csv(final_cleaned_file, index=False)
-        logging.info(f"Saved final cleaned dataset to {final_cleaned_file}")
+    # Stream each chunk into the final datasets instead of keeping every chunk in memory
+    with open(final_cleaned_file, 'w', newline='', encoding='utf-8') as clean_fh, \
+            open(final_garbage_file, 'w', newline='', encoding='utf-8') as garbage_fh, \
+            (ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else InlineExecutor()) as executor:
+        for i, chunk in enumerate(pd.read_csv(file_path, chunksize=chunk_size, delimiter=';', dtype=read_dtypes)):
+            pending.append((i, executor.submit(process_chunk, chunk, i)))
+            if len(pending) >= max_workers:
+                save_chunk(*pending.popleft(), duplicate_keys, clean_fh, garbage_fh)
 
-    if all_garbage_chunks:
-        final_garbage_data = pd.concat(all_garbage_chunks, ignore_index=True)
-        final_garbage_file = f"{garbage_file_prefix}_final.csv"
-        final_garbage_data.to_csv(final_garbage_file, index=False)
-        logging.info(f"Saved final garbage dataset to {final_garbage_file}")
+        while pending:
+            save_chunk(*pending.popleft(), duplicate_keys, clean_fh, garbage_fh)
+    
+    logging.info("Data processing complete.")
+    logging.info("Saved final cleaned dataset to %s", final_cleaned_file)
+    logging.info("Saved final garbage dataset to %s", final_garbage_file)
 
 # Main entry point
 if __name__ == "__main__":
@@ -160,9 +215,9 @@ if __name__ == "__main__":
     garbage_file_prefix = r'C:\Users\garne\Documents\DATA CLEANING\Garbage Sets\Garbage_Japan'
     
     try:
-        # Process the data and save chunks
+        # Process the data and save the final datasets
         process_data(input_file, clean_file_prefix, garbage_file_prefix)
         
     except Exception as e:
-        logging.error(f"Unhandled exception: {e}")
+        logging.error("Unhandled exception: %s", e)
         print(f"An error occurred: {e}")
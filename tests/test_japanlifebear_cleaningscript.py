@@ -0,0 +1,84 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import japanlifebear_cleaningscript as script
+
+
+def make_chunk(mail_addresses, birthdays=None, created_at=None):
+    """Builds a raw chunk with one row per mail address, as read_csv would yield it."""
+    n = len(mail_addresses)
+    if birthdays is None:
+        birthdays = ['1990-05-01'] * n
+    if created_at is None:
+        created_at = ['2012-01-01 10:00:00'] * n
+    return pd.DataFrame({
+        'id': range(1, n + 1),
+        'login_id': pd.Series([f'user{i}' for i in range(n)], dtype=script.string_dtype),
+        'mail_address': pd.Series(mail_addresses, dtype=script.string_dtype),
+        'password': pd.Series(['pw'] * n, dtype=script.string_dtype),
+        'created_at': created_at,
+        'salt': pd.Series(['s'] * n, dtype=script.string_dtype),
+        'birthday_on': birthdays,
+        'gender': pd.Series(['1'] * n, dtype='category'),
+    })
+
+
+def test_non_ascii_email_is_valid():
+    chunk, _ = script.process_chunk(make_chunk(['はな@example.jp', 'taro@例え.jp', 'bob@example']), 0)
+    assert chunk['Email_Valid'].tolist() == [True, True, False]
+
+
+def test_birthday_formats_can_mix_within_a_chunk():
+    mail_addresses = [f'user{i}@example.com' for i in range(4)]
+    birthdays = ['1994-05-06', '1995/05/06', 'notadate', None]
+    chunk, _ = script.process_chunk(make_chunk(mail_addresses, birthdays), 0)
+    assert chunk['Birthday_Valid'].tolist() == [True, True, False, True]
+
+
+def test_created_at_formats_can_mix_within_a_chunk():
+    mail_addresses = [f'user{i}@example.com' for i in range(2)]
+    chunk, _ = script.process_chunk(make_chunk(mail_addresses, created_at=['2012-01-06 10:00:00', '2012-01-07 11:00']), 0)
+    assert [str(d) for d in chunk['created_at']] == ['2012-01-06', '2012-01-07']
+
+
+INPUT_ROWS = [
+    'id;login_id;mail_address;password;created_at;salt;birthday_on;gender',
+    '1;alice;alice@example.com;pw1;2012-01-01 10:00:00;s1;1990-05-01;1',
+    '2;bob;bob@example;pw2;2012-01-02 10:00:00;s2;1991-05-01;0',
+    '3;dup;dup@example.com;pw3;2012-01-03 10:00:00;s3;1992-05-01;1',
+    '4;carol;carol@example.com;pw4;2012-01-04 10:00:00;s4;1993-05-01;0',
+    '5;dave;dave@example.com;pw5;2012-01-05 10:00:00;s5;1994-05-01;1',
+    '6;dup!;dup@example.com;pw6;2012-01-06 10:00:00;s6;1995-05-01;0',
+    '7;erin;erin@example.com;pw7;2012-01-07 10:00:00;s7;1996-05-01;1',
+]
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+@pytest.mark.parametrize('chunk_size', [2, 100])
+def test_process_data_output_does_not_depend_on_chunk_size(tmp_path, monkeypatch, chunk_size, max_workers):
+    input_file = tmp_path / 'input.csv'
+    input_file.write_text('\n'.join(INPUT_ROWS) + '\n', encoding='utf-8')
+    monkeypatch.setattr(script, 'chunk_size', chunk_size)
+    monkeypatch.setattr(script, 'max_workers', max_workers)
+
+    script.process_data(str(input_file), str(tmp_path / 'Clean'), str(tmp_path / 'Garbage'))
+
+    clean_lines = (tmp_path / 'Clean_final.csv').read_text(encoding='utf-8').splitlines()
+    garbage_lines = (tmp_path / 'Garbage_final.csv').read_text(encoding='utf-8').splitlines()
+
+    # Each file has exactly one header, on the first line
+    assert [line.startswith('id,') for line in clean_lines].count(True) == 1
+    assert [line.startswith('id,') for line in garbage_lines].count(True) == 1
+    assert clean_lines[0].startswith('id,') and garbage_lines[0].startswith('id,')
+
+    # Rows stay in file order; both copies of the repeated key (rows 3 and 6, the latter
+    # only after character cleaning) are garbage, whichever chunks they fall in
+    clean_ids = [line.split(',')[0] for line in clean_lines[1:]]
+    garbage_ids = [line.split(',')[0] for line in garbage_lines[1:]]
+    assert clean_ids == ['1', '4', '5', '7']
+    assert garbage_ids == ['2', '3', '6']